@@ -1,17 +1,85 @@
 #!/usr/bin/env python3
 import os
-from python_bitvavo_api.bitvavo import Bitvavo
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from python_bitvavo_api.bitvavo import Bitvavo, createSignature, debugToConsole
 import logging
 from telegram import Bot
 import asyncio
 from datetime import datetime
+from ttl_cache import cached
 
 # Set up logging to stdout (for GitHub Actions logs)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class PooledBitvavo(Bitvavo):
+    """Bitvavo client that sends REST calls through one pooled keep-alive session.
+
+    The upstream client calls requests.get/requests.request directly, opening a new
+    connection per call; these overrides mirror the request methods of python-bitvavo-api
+    1.4.3 (pinned in the workflow) using self.session. Re-check them when upgrading.
+    """
+
+    def __init__(self, options={}):
+        super().__init__(options)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+
+    def close(self):
+        """Closes the pooled HTTP session."""
+        self.session.close()
+
+    def publicRequest(self, url):
+        debugToConsole("REQUEST: " + url)
+        headers = None
+        if self.APIKEY != '':
+            now = int(time.time() * 1000)
+            sig = createSignature(now, 'GET', url.replace(self.base, ''), None, self.APISECRET)
+            headers = {
+                'bitvavo-access-key': self.APIKEY,
+                'bitvavo-access-signature': sig,
+                'bitvavo-access-timestamp': str(now),
+                'bitvavo-access-window': str(self.ACCESSWINDOW)
+            }
+        r = self.session.get(url, headers=headers, timeout=self.timeout)
+        return self._handleResponse(r)
+
+    def privateRequest(self, endpoint, postfix, body=None, method='GET'):
+        now = int(time.time() * 1000)
+        sig = createSignature(now, method, (endpoint + postfix), body, self.APISECRET)
+        url = self.base + endpoint + postfix
+        headers = {
+            'bitvavo-access-key': self.APIKEY,
+            'bitvavo-access-signature': sig,
+            'bitvavo-access-timestamp': str(now),
+            'bitvavo-access-window': str(self.ACCESSWINDOW),
+        }
+        debugToConsole("REQUEST: " + url)
+        r = self.session.request(method, url, headers=headers, json=body, timeout=self.timeout)
+        return self._handleResponse(r)
+
+    def _handleResponse(self, r):
+        """Updates rate limit state from the response, as the upstream client does, and returns its JSON."""
+        data = r.json()
+        if 'error' in data:
+            self.updateRateLimit(data)
+        else:
+            self.updateRateLimit(r.headers)
+        return data
+
+def fetch_prices(bitvavo):
+    """Fetches EUR prices for all markets in a single request."""
+    price_data = bitvavo.tickerPrice({})
+    # On failure the client returns an error dict instead of raising
+    if not isinstance(price_data, list):
+        raise RuntimeError(f"Error fetching prices: {price_data.get('error', price_data)}")
+    return {p['market']: float(p['price']) for p in price_data if 'price' in p}
+
 async def get_bitvavo_portfolio():
     """Retrieves Bitvavo portfolio and calculates values."""
+    bitvavo = None
     try:
         api_key = os.getenv('BITVAVO_API_KEY')
         api_secret = os.getenv('BITVAVO_API_SECRET')
@@ -19,7 +87,7 @@ async def get_bitvavo_portfolio():
         if not api_key or not api_secret:
             raise ValueError("Bitvavo API key or secret not found in environment variables.")
         
-        bitvavo = Bitvavo({'APIKEY': api_key, 'APISECRET': api_secret})
+        bitvavo = PooledBitvavo({'APIKEY': api_key, 'APISECRET': api_secret})
         logger.info("Bitvavo client initialized successfully.")
         
         result = {
@@ -31,6 +99,10 @@ async def get_bitvavo_portfolio():
         balance = bitvavo.balance({})
         logger.info("Retrieved balance information.")
         
+        # Fetch prices for all markets in a single request instead of one per asset
+        prices = cached('bitvavo_prices', 30, lambda: fetch_prices(bitvavo))
+        logger.info("Retrieved price information.")
+        
         total_portfolio_value = 0.0
         asset_values = []
         
@@ -40,22 +112,22 @@ async def get_bitvavo_portfolio():
             in_order = float(asset["inOrder"])
             total_amount = available + in_order
             
+            # Skip dust-zero balances; they add nothing to the value or the message
+            if total_amount == 0 and symbol != "EUR":
+                continue
+            
             value_eur = 0.0
             if symbol == "EUR":
                 value_eur = available
                 total_portfolio_value += available
             else:
-                try:
-                    market = f"{symbol}-EUR"
-                    price_data = bitvavo.tickerPrice({'market': market})
-                    if 'price' in price_data:
-                        price = float(price_data['price'])
-                        value_eur = total_amount * price
-                        total_portfolio_value += value_eur
-                    else:
-                        logger.warning(f"No price data for {market}.")
-                except Exception as e:
-                    logger.error(f"Error fetching price for {market}: {str(e)}")
+                market = f"{symbol}-EUR"
+                price = prices.get(market)
+                if price is not None:
+                    value_eur = total_amount * price
+                    total_portfolio_value += value_eur
+                else:
+                    logger.warning(f"No price data for {market}.")
             
             asset_values.append([symbol, total_amount, value_eur])
         
@@ -69,6 +141,10 @@ async def get_bitvavo_portfolio():
     except Exception as e:
         logger.error(f"Error retrieving portfolio: {str(e)}")
         return {"error": str(e)}
+    
+    finally:
+        if bitvavo is not None:
+            bitvavo.close()
 
 async def send_to_telegram(portfolio_data):
     """Sends portfolio data to Telegram chat."""
@@ -83,13 +159,16 @@ async def send_to_telegram(portfolio_data):
         
         # Format message
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        message = f"📊 *Bitvavo Portfolio Update* ({timestamp})\n\n"
-        message += f"💰 *Total Portfolio Value*: {portfolio_data['portfolio_value_eur']:.2f} EUR\n\n"
-        message += "📈 *Asset Details*:\n"
-        for asset in portfolio_data["asset_values"]:
-            symbol, amount, value = asset
-            message += f"- {symbol}: {amount:.6f} ({value:.2f} EUR)\n"
-        message += f"\n🔒 *Remaining Rate Limit*: {portfolio_data['rate_limit_remaining']}"
+        lines = [
+            f"📊 *Bitvavo Portfolio Update* ({timestamp})",
+            "",
+            f"💰 *Total Portfolio Value*: {portfolio_data['portfolio_value_eur']:.2f} EUR",
+            "",
+            "📈 *Asset Details*:",
+        ]
+        lines += [f"- {symbol}: {amount:.6f} ({value:.2f} EUR)" for symbol, amount, value in portfolio_data["asset_values"]]
+        lines += ["", f"🔒 *Remaining Rate Limit*: {portfolio_data['rate_limit_remaining']}"]
+        message = "\n".join(lines)
         
         # Send message
         await bot.send_message(chat_id=chat_id, text=message, parse_mode="Markdown")
@@ -1,40 +1,45 @@
 import os
 import time
+import asyncio
+import aiohttp
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from binance.client import Client
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor
-import threading
 import logging
-from datetime import datetime, timedelta
+import warnings
+from datetime import datetime
+from functools import lru_cache
 import pytz
-import gspread
-from google.oauth2.service_account import Credentials
 import base64
-import json
+import orjson
+from ttl_cache import cached_async
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv('BINANCE_API_KEY')
-api_secret = os.getenv('BINANCE_API_SECRET')
 spreadsheet_id = os.getenv('GOOGLE_SPREADSHEET_ID')
 
-# Initialize Binance client
-client = Client(api_key, api_secret)
+# Public Binance REST endpoints, queried directly with aiohttp
+TICKER_24H_URL = 'https://api.binance.com/api/v3/ticker/24hr'
+KLINES_URL = 'https://api.binance.com/api/v3/klines'
+KLINES_MAX_LIMIT = 1000  # Maximum number of candles per /api/v3/klines request
+CANDLES_PER_DAY = 1440  # Number of 1-minute candles in 24 hours
+MAX_CONCURRENT_REQUESTS = 20  # Also caps open connections to Binance
 
 # Google Sheets authentication
+@lru_cache(maxsize=1)
 def get_gspread_client():
-    """Initialize gspread client using service account credentials."""
+    """Initialize gspread client using service account credentials, cached for reuse within the process."""
+    # Imported lazily; only needed when writing to Google Sheets
+    import gspread
+    from google.oauth2.service_account import Credentials
     try:
         # Decode base64-encoded service account JSON from environment variable
         creds_base64 = os.getenv('GOOGLE_CREDENTIALS')
         creds_json = base64.b64decode(creds_base64).decode('utf-8')
-        creds_dict = json.loads(creds_json)
+        creds_dict = orjson.loads(creds_json)
         
         # Create credentials
         scopes = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
@@ -49,40 +54,67 @@ def get_gspread_client():
 # API rate limit settings
 RATE_LIMIT_PER_MINUTE = 1200  # Conservative estimate of weight units per minute
 WEIGHT_THRESHOLD = RATE_LIMIT_PER_MINUTE * 0.9  # 90% of rate limit
-current_weight = 0
-lock = threading.Lock()
-last_reset_time = time.time()
+BACKOFF_THRESHOLD = RATE_LIMIT_PER_MINUTE * 0.8  # Server-reported usage above this throttles requests
 
 # Directory to save plots
 os.makedirs('plots', exist_ok=True)
 
-def reset_rate_limit():
-    """Reset the rate limit counter every minute."""
-    global current_weight, last_reset_time
-    current_time = time.time()
-    if current_time - last_reset_time >= 60:
-        with lock:
-            current_weight = 0
-            last_reset_time = current_time
-            logging.info("Rate limit counter reset.")
-
-def check_rate_limit(request_weight):
-    """Check if a request can be made without exceeding the rate limit."""
-    global current_weight
-    reset_rate_limit()
-    with lock:
-        if current_weight + request_weight > WEIGHT_THRESHOLD:
-            sleep_time = 60 - (time.time() - last_reset_time)
-            if sleep_time > 0:
-                logging.info(f"Rate limit approaching. Sleeping for {sleep_time:.2f} seconds.")
-                time.sleep(sleep_time)
-                reset_rate_limit()
-        current_weight += request_weight
-
-def get_top_liquid_coins(n=100):
+class TokenBucket:
+    """Rate limiter that refills weight units continuously instead of resetting every minute."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate / 60  # Weight units per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.ts = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, weight):
+        """Wait until a request of the given weight can be made without exceeding the rate limit."""
+        while True:
+            async with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+                self.ts = now
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                sleep_time = (weight - self.tokens) / self.rate
+            # Sleep outside the lock so other tasks can still check the bucket
+            logging.info(f"Rate limit approaching. Sleeping for {sleep_time:.2f} seconds.")
+            await asyncio.sleep(sleep_time)
+
+    async def reconcile(self, used_weight, limit):
+        """Drop available tokens so that used_weight plus future requests stays within limit."""
+        async with self.lock:
+            self.tokens = min(self.tokens, limit - used_weight)
+
+rate_limiter = TokenBucket(WEIGHT_THRESHOLD, WEIGHT_THRESHOLD)
+last_backoff_minute = None  # Minute in which the last back-off warning was logged
+
+async def track_used_weight(response):
+    """Feed Binance's reported used weight back into the rate limiter."""
+    global last_backoff_minute
+    used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M')
+    if used_weight is None:
+        return
+    used_weight = int(used_weight)
+    current_minute = int(time.time() // 60)
+    if used_weight > BACKOFF_THRESHOLD and last_backoff_minute != current_minute:
+        last_backoff_minute = current_minute
+        logging.warning(f"Binance reports {used_weight} used weight this minute. Backing off.")
+    await rate_limiter.reconcile(used_weight, BACKOFF_THRESHOLD)
+
+async def get_top_liquid_coins(session, n=100):
     """Get the top N coins by 24-hour trading volume."""
-    check_rate_limit(40)  # Weight for /api/v3/ticker/24hr
-    tickers = client.get_ticker()
+    async def fetch_tickers():
+        await rate_limiter.acquire(40)  # Weight for /api/v3/ticker/24hr
+        async with session.get(TICKER_24H_URL) as response:
+            await track_used_weight(response)
+            response.raise_for_status()
+            return orjson.loads(await response.read())
+
+    tickers = await cached_async('tickers24h', 60, fetch_tickers)
     # Filter for USDT pairs and sort by volume
     usdt_pairs = [ticker for ticker in tickers if ticker['symbol'].endswith('USDT')]
     sorted_tickers = sorted(usdt_pairs, key=lambda x: float(x['quoteVolume']), reverse=True)
@@ -90,39 +122,84 @@ def get_top_liquid_coins(n=100):
     logging.info(f"Retrieved {len(top_coins)} liquid coins.")
     return top_coins
 
-def fetch_candlestick_data(symbol):
-    """Fetch 1-minute candlestick data for the last 24 hours for a given symbol."""
+async def fetch_candlestick_data(session, semaphore, symbol):
+    """Fetch 1-minute candlestick data for the last 24 hours as (open_time, close) arrays."""
     try:
-        check_rate_limit(1)  # Weight for /api/v3/klines
-        end_time = datetime.now(pytz.UTC)
-        start_time = end_time - timedelta(days=1)
-        klines = client.get_historical_klines(
-            symbol=symbol,
-            interval=Client.KLINE_INTERVAL_1MINUTE,
-            start_str=int(start_time.timestamp() * 1000),
-            end_str=int(end_time.timestamp() * 1000)
-        )
-        # Convert to DataFrame
-        df = pd.DataFrame(klines, columns=[
-            'open_time', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-            'taker_buy_quote', 'ignore'
-        ])
-        df['open_time'] = pd.to_datetime(df['open_time'], unit='ms')
-        df['close'] = df['close'].astype(float)
+        klines = []
+        end_ms = None
+        async with semaphore:
+            # Walk back from the most recent candle until the last 24 hours are covered
+            while len(klines) < CANDLES_PER_DAY:
+                await rate_limiter.acquire(1)  # Weight for /api/v3/klines
+                params = {
+                    'symbol': symbol,
+                    'interval': '1m',
+                    'limit': min(KLINES_MAX_LIMIT, CANDLES_PER_DAY - len(klines))
+                }
+                if end_ms is not None:
+                    params['endTime'] = end_ms
+                async with session.get(KLINES_URL, params=params) as response:
+                    await track_used_weight(response)
+                    response.raise_for_status()
+                    batch = orjson.loads(await response.read())
+                klines[:0] = batch
+                if len(batch) < params['limit']:
+                    break  # No older candles available
+                end_ms = batch[0][0] - 1
+        # Convert while still inside the try so a malformed payload only skips this symbol
+        arrays = klines_to_arrays(klines)
         logging.info(f"Fetched data for {symbol}")
-        return symbol, df
+        return symbol, arrays
     except Exception as e:
         logging.error(f"Error fetching data for {symbol}: {e}")
-        return symbol, None
+        return symbol, (None, None)
+
+async def fetch_all_candlestick_data(session, symbols):
+    """Fetch candlestick data for all symbols concurrently, keyed by symbol."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return dict(await asyncio.gather(*(fetch_candlestick_data(session, semaphore, symbol) for symbol in symbols)))
 
-def calculate_volatility(df):
-    """Calculate volatility as the standard deviation of log returns."""
-    if df is None or df.empty:
-        return np.nan
-    df['log_return'] = np.log(df['close'] / df['close'].shift(1))
-    volatility = df['log_return'].std() * np.sqrt(1440)  # Annualized for 1-minute data
-    return volatility
+def klines_to_arrays(klines):
+    """Extract open times (ms) and close prices from raw candlestick data."""
+    # Each kline has 12 fields; only open_time (0) and close (4) are used downstream
+    arr = np.asarray(klines, dtype=object).reshape(-1, 12)
+    open_time = arr[:, 0].astype(np.int64)
+    close = arr[:, 4].astype(np.float64)
+    return open_time, close
+
+def calculate_volatilities(closes):
+    """Calculate volatility as the standard deviation of log returns for each close price series."""
+    if not closes:
+        return np.empty(0, dtype=np.float64)
+    # Stack all series into one matrix, right-padding shorter ones with NaN
+    length = max(close.size for close in closes)
+    prices = np.full((len(closes), length), np.nan, dtype=np.float64)
+    for row, close in zip(prices, closes):
+        row[:close.size] = close
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # Rows with fewer than two returns warn about degrees of freedom; they are masked below
+        warnings.simplefilter('ignore', RuntimeWarning)
+        log_returns = np.log(prices[:, 1:] / prices[:, :-1])
+        std = np.nanstd(log_returns, axis=1, ddof=1)
+    count = (~np.isnan(log_returns)).sum(axis=1)
+    # Need at least two log returns for a sample std
+    std[count < 2] = np.nan
+    return std * np.sqrt(CANDLES_PER_DAY)  # Annualized for 1-minute data
+
+def select_extremes(names, values, k=10):
+    """Return the k most and k least volatile coins, each ordered by descending volatility."""
+    valid = np.flatnonzero(~np.isnan(values))
+    k = min(k, valid.size)
+    if k == 0:
+        return [], []
+    # Partial selection is O(N); only the k selected entries get sorted
+    top_idx = valid[np.argpartition(-values[valid], k - 1)[:k]]
+    bottom_idx = valid[np.argpartition(values[valid], k - 1)[:k]]
+    top_idx = top_idx[np.argsort(-values[top_idx])]
+    bottom_idx = bottom_idx[np.argsort(-values[bottom_idx])]
+    top = [(names[i], values[i]) for i in top_idx]
+    bottom = [(names[i], values[i]) for i in bottom_idx]
+    return top, bottom
 
 def save_to_google_sheets(top_10_volatile):
     """Save top 10 volatile coins to Google Spreadsheet, clearing old data."""
@@ -139,8 +216,8 @@ def save_to_google_sheets(top_10_volatile):
         headers = ['Timestamp', 'Symbol', 'Volatility']
         data = [[timestamp, symbol, volatility] for symbol, volatility in top_10_volatile]
         
-        # Append headers and data
-        worksheet.append_rows([headers] + data)
+        # Write headers and data in place; RAW skips Sheets' formula parsing
+        worksheet.update(values=[headers] + data, range_name='A1', value_input_option='RAW')
         logging.info("Successfully cleared and updated Volatile_Coins sheet in Trade_Management spreadsheet.")
     except Exception as e:
         logging.error(f"Failed to update Google Spreadsheet: {e}")
@@ -148,55 +225,61 @@ def save_to_google_sheets(top_10_volatile):
 
 def plot_price_courses(symbols, title, filename):
     """Plot price courses for given symbols and save the plot."""
-    plt.figure(figsize=(12, 8))
-    for symbol, df in symbols:
-        plt.plot(df['open_time'], df['close'], label=symbol)
-    plt.title(title)
-    plt.xlabel('Time')
-    plt.ylabel('Price (USDT)')
-    plt.legend()
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(f'plots/{filename}.png')
-    plt.close()
+    # Imported lazily; Agg backend avoids probing for a GUI toolkit
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(12, 8))
+    for symbol, open_time, close in symbols:
+        ax.plot(pd.to_datetime(open_time, unit='ms'), close, label=symbol)
+    ax.set_title(title)
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Price (USDT)')
+    ax.legend()
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    fig.savefig(f'plots/{filename}.png')
+    plt.close(fig)
     logging.info(f"Saved plot: {filename}")
 
-def main():
-    # Step 1: Get top 100 liquid coins
-    symbols = get_top_liquid_coins(100)
-    
-    # Step 2: Fetch candlestick data using multithreading
-    results = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(fetch_candlestick_data, symbol) for symbol in symbols]
-        for future in futures:
-            results.append(future.result())
+def plot_all_price_courses(plots):
+    """Render each (symbols, title, filename) plot in turn."""
+    for symbols, title, filename in plots:
+        plot_price_courses(symbols, title, filename)
+
+async def main():
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS, limit_per_host=MAX_CONCURRENT_REQUESTS)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # Step 1: Get top 100 liquid coins; kline fetches need this list, so it is awaited first
+        symbols = await get_top_liquid_coins(session, 100)
+        
+        # Step 2: Fetch candlestick data concurrently; each symbol is converted to arrays as part of its fetch
+        result_by_symbol = await fetch_all_candlestick_data(session, symbols)
     
     # Step 3: Calculate volatility for each coin
-    volatilities = []
-    for symbol, df in results:
-        if df is not None:
-            volatility = calculate_volatility(df)
-            volatilities.append((symbol, volatility))
+    fetched_symbols = [symbol for symbol, (open_time, close) in result_by_symbol.items() if close is not None]
+    volatilities = calculate_volatilities([result_by_symbol[symbol][1] for symbol in fetched_symbols])
     
-    # Step 4: Sort by volatility
-    volatilities = sorted(volatilities, key=lambda x: x[1], reverse=True)
-    top_10_volatile = [(x[0], x[1]) for x in volatilities[:10] if not np.isnan(x[1])]
-    bottom_10_volatile = [(x[0], x[1]) for x in volatilities[-10:] if not np.isnan(x[1])]
+    # Step 4: Select the most and least volatile coins. This needs every volatility, so plotting
+    # and the sheet write below cannot start until all fetches have finished.
+    top_10_volatile, bottom_10_volatile = select_extremes(fetched_symbols, volatilities, 10)
     
-    # Step 5: Save top 10 volatile coins to Google Sheets
+    # Step 5: Plot price courses one after another in a single worker thread
+    plots = []
     if top_10_volatile:
-        save_to_google_sheets(top_10_volatile)
+        top_10_data = [(symbol, *result_by_symbol[symbol]) for symbol, _ in top_10_volatile]
+        plots.append((top_10_data, 'Top 10 Most Volatile Coins', 'top_10_volatile'))
+    if bottom_10_volatile:
+        bottom_10_data = [(symbol, *result_by_symbol[symbol]) for symbol, _ in bottom_10_volatile]
+        plots.append((bottom_10_data, 'Top 10 Least Volatile Coins', 'bottom_10_volatile'))
+    jobs = [asyncio.to_thread(plot_all_price_courses, plots)]
     
-    # Step 6: Plot price courses
+    # Step 6: Save top 10 volatile coins to Google Sheets while the plots are being drawn
     if top_10_volatile:
-        top_10_data = [(symbol, df) for symbol, df in results if symbol in [x[0] for x in top_10_volatile]]
-        plot_price_courses(top_10_data, 'Top 10 Most Volatile Coins', 'top_10_volatile')
-    if bottom_10_volatile:
-        bottom_10_data = [(symbol, df) for symbol, df in results if symbol in [x[0] for x in bottom_10_volatile]]
-        plot_price_courses(bottom_10_data, 'Top 10 Least Volatile Coins', 'bottom_10_volatile')
+        jobs.append(asyncio.to_thread(save_to_google_sheets, top_10_volatile))
+    await asyncio.gather(*jobs)
     
     logging.info("Script completed successfully.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
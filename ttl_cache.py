@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+_cache = None
+
+def _cache_file():
+    """Return the optional JSON file used to share the cache between runs."""
+    # Read on each use rather than at import so a CACHE_FILE loaded from .env later is honoured.
+    # Without it the cache only lives for the current process.
+    return os.getenv('CACHE_FILE')
+
+def _read_cache_file(cache_file):
+    """Read the cache file, returning an empty cache if it is missing or unreadable."""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def _load_cache():
+    """Load the cache on first use."""
+    global _cache
+    if _cache is None:
+        cache_file = _cache_file()
+        _cache = _read_cache_file(cache_file) if cache_file else {}
+    return _cache
+
+def _save_entry(key):
+    """Atomically persist one entry, keeping entries that other processes have written."""
+    cache_file = _cache_file()
+    if not cache_file:
+        return
+    data = _read_cache_file(cache_file)
+    data[key] = _cache[key]
+    directory = os.path.dirname(os.path.abspath(cache_file))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.cache-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, cache_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning(f"Could not write cache file {cache_file}: {e}")
+
+def _lookup(key, ttl):
+    """Return (True, value) if key holds an entry younger than ttl seconds, else (False, None)."""
+    entry = _load_cache().get(key)
+    if entry is not None and time.time() - entry[0] < ttl:
+        logger.info(f"Using cached {key}.")
+        return True, entry[1]
+    return False, None
+
+def _store(key, result):
+    """Store result under key with the current time and persist it if a cache file is configured."""
+    _load_cache()[key] = (time.time(), result)
+    _save_entry(key)
+
+def cached(key, ttl, fn):
+    """Return the result of fn() stored under key, calling fn() if it is missing or older than ttl seconds.
+
+    Results must be JSON-serializable. If fn() raises, nothing is stored.
+    """
+    hit, result = _lookup(key, ttl)
+    if not hit:
+        result = fn()
+        _store(key, result)
+    return result
+
+async def cached_async(key, ttl, fn):
+    """Like cached(), but awaits the coroutine function fn on a miss."""
+    hit, result = _lookup(key, ttl)
+    if not hit:
+        result = await fn()
+        _store(key, result)
+    return result